@@ -3,87 +3,450 @@
 Migration Tool - Transfer data between source and target databases.
 
 Usage:
-  MoveSync.py [--database=<dbname>] [--info=<client>] [--start] [--help] [-y] [--reports] [--setup] [--startmanual]
+  MoveSync.py [--database=<dbname>] [--info=<client>] [--start] [--help] [-y] [--reports] [--setup] [--startmanual] [--parallel=<n>] [--batch-size=<rows>] [--unlogged-during-load] [--exact] [--schemas=<list>]
 """
 
 import subprocess
+from datetime import datetime
 from docopt import docopt
 import json
-from sqlalchemy import create_engine
+import orjson
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool, QueuePool
 import urllib.parse
 import os
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import cpu_count
 from db_info import fetch_db_info, compare_row_counts, logging_setup
 
 # ---------------------------- Logging Setup ----------------------------
-logger = logging_setup("Migration.log")
+logger = logging_setup("Migration", "Migration.log")
+
+# Rows per COPY transaction; keeps locks short and WAL bounded without
+# dropping below the per-batch overhead floor.
+DEFAULT_BATCH_SIZE = 50000
 
 # ---------------------------- Core Functions ----------------------------
 
+@lru_cache(maxsize=1)
+def _load_db_credentials(credentials_json: str, mtime: float):
+    """Reads and parses the credentials file; cached per (path, mtime)."""
+    with open(credentials_json, 'rb') as file:
+        credentials = orjson.loads(file.read())
+    for side in ("source", "target"):
+        # Quote once at load time instead of on every engine creation
+        credentials[side]["password_quoted"] = urllib.parse.quote_plus(credentials[side]["password"])
+    return {
+        "source": credentials["source"],
+        "target": credentials["target"]
+    }
+
 def fetch_db_credentials(credentials_json: str):
-    """Loads source and target DB credentials from a JSON file."""
+    """Loads source and target DB credentials from a JSON file.
+
+    Keyed on the file's mtime so repeated calls within one process reuse
+    the parsed result while edits to the file still take effect.
+    """
     try:
-        with open(credentials_json, 'r') as file:
-            credentials = json.load(file)
-        return {
-            "source": credentials["source"],
-            "target": credentials["target"]
-        }
+        return _load_db_credentials(credentials_json, os.path.getmtime(credentials_json))
     except Exception as e:
         logger.error("Error loading DB credentials: %s", e)
         raise
 
-def connect_to_db(user, password, host, port, database):
-    """Creates a SQLAlchemy engine using PostgreSQL connection string."""
+def connect_to_db(user, password, host, port, database, password_quoted=None,
+                  pool_cls=None, pool_size=10):
+    """Creates a SQLAlchemy engine using PostgreSQL connection string.
+
+    pool_size should match the expected number of concurrent checkouts;
+    worker processes pass pool_cls=NullPool to get one unpooled
+    connection per use with no pooling overhead.
+    """
     try:
-        engine = create_engine(
-            f"postgresql://{user}:{urllib.parse.quote_plus(password)}@{host}:{port}/{database}"
-        )
+        pwq = password_quoted or urllib.parse.quote_plus(password)
+        # psycopg (v3) speaks the binary protocol; prepare_threshold=0
+        # prepares statements on first execution
+        url = f"postgresql+psycopg://{user}:{pwq}@{host}:{port}/{database}"
+        connect_args = {"prepare_threshold": 0}
+        if pool_cls is NullPool:
+            engine = create_engine(url, poolclass=NullPool, connect_args=connect_args)
+        else:
+            engine = create_engine(
+                url,
+                poolclass=pool_cls or QueuePool,
+                pool_size=pool_size,
+                max_overflow=0,
+                pool_recycle=3600,
+                connect_args=connect_args
+            )
         return engine
     except Exception as e:
         logger.error("Error connecting to database '%s': %s", database, e)
         raise
 
+# Engines cached per config-file mtime so repeated CLI calls in one
+# process (e.g. --info=both) do not rebuild them.
+_connection_cache = {}
+
 def setup_connection():
     """Loads credentials and sets up both source and target DB connections."""
     try:
-        logger.info("Loading DB credentials...")
         if not os.path.exists("db_config.json"):
             raise FileNotFoundError("Credentials file not found. Please create 'db_config.json' using --setup.")
+        mtime = os.path.getmtime("db_config.json")
+        cached = _connection_cache.get("db_config.json")
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        logger.info("Loading DB credentials...")
         credentials = fetch_db_credentials("db_config.json")
         source_engine = connect_to_db(**credentials["source"])
         target_engine = connect_to_db(**credentials["target"])
+        _connection_cache["db_config.json"] = (mtime, (credentials, source_engine, target_engine))
         return credentials, source_engine, target_engine
     except Exception as e:
         logger.error("Error during setup_connection: %s", e)
         raise
 
-def start_migration(database_name: str, auto_confirm: bool = False):
-    """Starts the migration process using a shell script."""
+def _copy_stream(src_conn, tgt_conn, out_sql, in_sql):
+    """Pipes one COPY TO stream into one COPY FROM stream."""
+    with src_conn.cursor() as src_cur, tgt_conn.cursor() as tgt_cur:
+        with src_cur.copy(out_sql) as cp_src, tgt_cur.copy(in_sql) as cp_tgt:
+            for block in cp_src:
+                cp_tgt.write(block)
+
+def _ctid_ranges(conn, schema, table, batch_size):
+    """Returns ctid page ranges covering ~batch_size rows each.
+
+    Returns None when the table fits in a single batch. The last range
+    is open-ended so rows beyond the (possibly stale) relpages estimate
+    are still picked up.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT relpages, reltuples FROM pg_class WHERE oid = to_regclass(%s)",
+            (f'"{schema}"."{table}"',)
+        )
+        row = cur.fetchone()
+    if not row or not row[0] or row[1] <= batch_size:
+        return None
+    relpages, reltuples = row
+    rows_per_page = max(reltuples / relpages, 1.0)
+    pages_per_batch = max(int(batch_size / rows_per_page), 1)
+    starts = list(range(0, relpages, pages_per_batch))
+    return [
+        (start, start + pages_per_batch if start + pages_per_batch < relpages else None)
+        for start in starts
+    ]
+
+def copy_table(source_engine, target_engine, schema, table, batch_size=DEFAULT_BATCH_SIZE,
+               snapshot_id=None):
+    """Streams one table from source to target using binary COPY.
+
+    Tables larger than batch_size rows are copied in ctid page ranges,
+    one transaction per range, so a huge table does not hold one giant
+    transaction open on the target. When snapshot_id is given, all
+    source reads run in one repeatable-read transaction pinned to that
+    exported snapshot, so every worker sees the same point in time.
+    """
+    src_conn = source_engine.raw_connection()
+    tgt_conn = target_engine.raw_connection()
+    in_sql = f'COPY "{schema}"."{table}" FROM STDIN WITH (FORMAT BINARY)'
+    try:
+        if snapshot_id:
+            # Must be the first statements of the source transaction.
+            with src_conn.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cur.execute(f"SET TRANSACTION SNAPSHOT '{snapshot_id}'")
+        ranges = _ctid_ranges(src_conn, schema, table, batch_size)
+        if ranges is None:
+            _copy_stream(src_conn, tgt_conn,
+                         f'COPY "{schema}"."{table}" TO STDOUT WITH (FORMAT BINARY)', in_sql)
+            tgt_conn.commit()
+        else:
+            for start, end in ranges:
+                upper = f" AND ctid < '({end},0)'" if end is not None else ""
+                out_sql = (
+                    f'COPY (SELECT * FROM "{schema}"."{table}" '
+                    f"WHERE ctid >= '({start},0)'{upper}) TO STDOUT WITH (FORMAT BINARY)"
+                )
+                _copy_stream(src_conn, tgt_conn, out_sql, in_sql)
+                tgt_conn.commit()
+        logger.info("Copied table %s.%s", schema, table)
+    except Exception as e:
+        tgt_conn.rollback()
+        logger.error("Error copying table '%s.%s': %s", schema, table, e)
+        raise
+    finally:
+        src_conn.rollback()
+        src_conn.close()
+        tgt_conn.close()
+
+def bulk_insert_unnest(engine, schema, table, columns, types, rows, on_conflict=""):
+    """Inserts a batch of rows in one statement via unnest'ed arrays.
+
+    For loads where COPY does not apply (e.g. upserts that need
+    ON CONFLICT), this sends one parse/plan/bind per batch instead of
+    per row: each column travels as a single typed array parameter.
+    Pass on_conflict as e.g. 'ON CONFLICT DO NOTHING'. Exported as a
+    utility for callers outside this module; the built-in migration
+    paths all go through COPY.
+    """
+    if not rows:
+        return
+    try:
+        column_list = ", ".join(f'"{c}"' for c in columns)
+        array_params = ", ".join(f"CAST(:p{i} AS {typ}[])" for i, typ in enumerate(types))
+        sql = text(
+            f'INSERT INTO "{schema}"."{table}" ({column_list}) '
+            f"SELECT * FROM unnest({array_params}) {on_conflict}"
+        )
+        params = {f"p{i}": list(column) for i, column in enumerate(zip(*rows))}
+        with engine.begin() as conn:
+            conn.execute(sql, params)
+        logger.info("Bulk inserted %d rows into %s.%s", len(rows), schema, table)
+    except Exception as e:
+        logger.error("Error bulk inserting into '%s.%s': %s", schema, table, e)
+        raise
+
+def _run_pg_command(args, password, extra_env=None):
+    """Runs a pg_dump/pg_restore command with PGPASSWORD set."""
+    env = os.environ.copy()
+    env["PGPASSWORD"] = password
+    if extra_env:
+        env.update(extra_env)
+    subprocess.run(args, check=True, env=env)
+
+def dump_schema(credentials, dump_file):
+    """Dumps the source schema (no data) in custom format."""
+    src = credentials["source"]
+    _run_pg_command([
+        "pg_dump", "-h", src["host"], "-p", str(src["port"]), "-U", src["user"],
+        "-d", src["database"], "-F", "c", "--schema-only",
+        "--no-owner", "--no-privileges", "--no-acl", "-f", dump_file
+    ], src["password"])
+
+def restore_section(credentials, dump_file, section, jobs=1):
+    """Restores one pg_restore section (pre-data or post-data) into the target."""
+    tgt = credentials["target"]
+    args = [
+        "pg_restore", "-h", tgt["host"], "-p", str(tgt["port"]), "-U", tgt["user"],
+        "-d", tgt["database"], "--no-owner", f"--section={section}"
+    ]
+    if jobs > 1:
+        args += ["-j", str(jobs)]
+    extra_env = None
+    if section == "post-data":
+        # Index and constraint builds benefit from larger maintenance memory
+        extra_env = {"PGOPTIONS": "-c maintenance_work_mem=2GB -c max_parallel_maintenance_workers=8"}
+    _run_pg_command(args + [dump_file], tgt["password"], extra_env)
+
+def _copy_one_table(credentials, schema, table, batch_size=DEFAULT_BATCH_SIZE, snapshot_id=None):
+    """Worker entry point: builds its own engines (engines do not fork-share cleanly)."""
+    source_engine = connect_to_db(**credentials["source"], pool_cls=NullPool)
+    target_engine = connect_to_db(**credentials["target"], pool_cls=NullPool)
+    try:
+        copy_table(source_engine, target_engine, schema, table,
+                   batch_size=batch_size, snapshot_id=snapshot_id)
+    finally:
+        source_engine.dispose()
+        target_engine.dispose()
+
+def copy_all_tables(credentials, source_engine, max_workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Copies every user table from source to target, one COPY stream per worker."""
+    with source_engine.connect() as conn:
+        # pg_stat_user_tables also lists materialized views and
+        # partitioned parents, neither of which COPY can read from;
+        # restrict to plain tables (partition leaves are relkind 'r').
+        tables = conn.execute(text("""
+            SELECT s.schemaname, s.relname
+            FROM pg_stat_user_tables s
+            JOIN pg_class c ON c.oid = s.relid
+            WHERE c.relkind = 'r'
+            ORDER BY s.n_live_tup DESC;
+        """)).fetchall()
+
+    max_workers = max_workers or min(cpu_count(), len(tables) or 1)
+    logger.info("Copying %d tables with %d parallel workers...", len(tables), max_workers)
+
+    # Workers each open their own connection, so without a shared
+    # snapshot concurrent writes on the source would land in some tables
+    # and not others. Export one snapshot here and keep its transaction
+    # open until every worker is done; each worker pins its reads to it.
+    snap_conn = source_engine.raw_connection()
+    try:
+        with snap_conn.cursor() as cur:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cur.execute("SELECT pg_export_snapshot()")
+            snapshot_id = cur.fetchone()[0]
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_copy_one_table, credentials, schema, table,
+                                batch_size, snapshot_id): (schema, table)
+                for schema, table in tables
+            }
+            for future in as_completed(futures):
+                schema, table = futures[future]
+                future.result()
+    finally:
+        snap_conn.rollback()
+        snap_conn.close()
+
+def sync_sequences(source_engine, target_engine):
+    """Carries sequence positions from source to target after the copy.
+
+    SEQUENCE SET entries live in pg_dump's data section, so the
+    --schema-only dump leaves every serial/identity sequence at its
+    start value; without this step the first insert on the target
+    collides with copied rows.
+    """
+    with source_engine.connect() as conn:
+        sequences = conn.execute(text(
+            "SELECT schemaname, sequencename, last_value "
+            "FROM pg_sequences WHERE last_value IS NOT NULL"
+        )).fetchall()
+    with target_engine.connect() as conn:
+        for schema, sequence, last_value in sequences:
+            conn.execute(
+                text("SELECT setval(:sequence, :value)"),
+                {"sequence": f'"{schema}"."{sequence}"', "value": last_value}
+            )
+        conn.commit()
+    logger.info("Synced %d sequence values to the target.", len(sequences))
+
+def refresh_materialized_views(target_engine):
+    """Refreshes every materialized view on the target in dependency order.
+
+    A --schema-only dump creates matviews WITH NO DATA and carries no
+    refresh entries (those live in pg_dump's data section), and the
+    table COPY skips them, so without this pass they would stay empty.
+    Views are ordered so that a matview reading from another matview is
+    refreshed after it.
+    """
+    with target_engine.connect() as conn:
+        matviews = conn.execute(text(
+            "SELECT n.nspname, c.relname "
+            "FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relkind = 'm'"
+        )).fetchall()
+        edges = conn.execute(text("""
+            SELECT DISTINCT dn.nspname, dc.relname, rn.nspname, rc.relname
+            FROM pg_depend d
+            JOIN pg_rewrite rw ON rw.oid = d.objid
+            JOIN pg_class dc ON dc.oid = rw.ev_class
+            JOIN pg_namespace dn ON dn.oid = dc.relnamespace
+            JOIN pg_class rc ON rc.oid = d.refobjid
+            JOIN pg_namespace rn ON rn.oid = rc.relnamespace
+            WHERE dc.relkind = 'm' AND rc.relkind = 'm' AND dc.oid <> rc.oid
+        """)).fetchall()
+
+        remaining = {(schema, view): set() for schema, view in matviews}
+        for dep_schema, dep_view, ref_schema, ref_view in edges:
+            remaining[(dep_schema, dep_view)].add((ref_schema, ref_view))
+        refreshed = 0
+        while remaining:
+            ready = sorted(mv for mv, deps in remaining.items()
+                           if not deps & remaining.keys())
+            if not ready:
+                # Should be unreachable (matview deps cannot cycle), but
+                # never spin forever on a catalog we misread.
+                ready = sorted(remaining)
+            for schema, view in ready:
+                conn.execute(text(f'REFRESH MATERIALIZED VIEW "{schema}"."{view}"'))
+                conn.commit()
+                del remaining[(schema, view)]
+                refreshed += 1
+    logger.info("Refreshed %d materialized views on the target.", refreshed)
+
+def _set_tables_logged_state(target_engine, logged: bool):
+    """Flips WAL logging for every user table on the target.
+
+    UNLOGGED during the initial load skips WAL entirely; SET LOGGED
+    afterwards does one WAL-logged rewrite, which is still cheaper than
+    per-row WAL for a bulk load. Only safe for first-time loads where a
+    crash simply means re-running the migration, and it breaks
+    replication of the loaded data, hence the opt-in flag.
+    """
+    keyword = "LOGGED" if logged else "UNLOGGED"
+    with target_engine.connect() as conn:
+        # SET [UN]LOGGED only applies to plain tables, so skip the
+        # materialized views and partitioned parents the stats view lists.
+        tables = conn.execute(text(
+            "SELECT s.schemaname, s.relname "
+            "FROM pg_stat_user_tables s "
+            "JOIN pg_class c ON c.oid = s.relid "
+            "WHERE c.relkind = 'r'"
+        )).fetchall()
+        for schema, table in tables:
+            conn.execute(text(f'ALTER TABLE "{schema}"."{table}" SET {keyword}'))
+        conn.commit()
+    logger.info("Set %d target tables to %s.", len(tables), keyword)
+
+def _confirm_migration(auto_confirm: bool) -> bool:
+    """Prompts for confirmation unless -y was passed."""
+    if auto_confirm:
+        return True
+    confirm = input("Do you want to start the migration? (y/n): ").strip().lower()
+    if confirm != "y":
+        logger.info("Migration aborted by user.")
+        return False
+    return True
+
+def _run_shell_migration(credentials, mode, dump_file=None):
+    """Invokes migrate_postgres.sh with the common credential argv."""
+    args = [
+        "bash", "migrate_postgres.sh",
+        credentials["source"]["database"],
+        credentials["source"]["user"],
+        credentials["source"]["password"],
+        credentials["source"]["host"],
+        str(credentials["source"]["port"]),
+        credentials["target"]["database"],
+        credentials["target"]["user"],
+        credentials["target"]["password"],
+        credentials["target"]["host"],
+        str(credentials["target"]["port"]),
+        mode
+    ]
+    if dump_file:
+        args.append(dump_file)
+    subprocess.run(args, check=True)
+
+def start_migration(database_name: str, auto_confirm: bool = False, parallel: int = None,
+                    batch_size: int = DEFAULT_BATCH_SIZE, unlogged_during_load: bool = False):
+    """Runs a three-phase migration: pre-data restore, parallel COPY, post-data restore.
+
+    Large objects (pg_largeobject / lo_*) are not carried over: they
+    live in pg_dump's data section, which the schema-only dump omits.
+    Databases that use them should migrate with --startmanual, whose
+    full dump/restore includes them.
+    """
     try:
         logger.info("Starting automatic migration process...")
         credentials, source_engine, target_engine = setup_connection()
 
-        if not auto_confirm:
-            confirm = input("Do you want to start the migration? (y/n): ").strip().lower()
-            if confirm != "y":
-                logger.info("Migration aborted by user.")
-                return
-
-        args = [
-            "bash", "migrate_postgres.sh",
-            credentials["source"]["database"],
-            credentials["source"]["user"],
-            credentials["source"]["password"],
-            credentials["source"]["host"],
-            str(credentials["source"]["port"]),
-            credentials["target"]["database"],
-            credentials["target"]["user"],
-            credentials["target"]["password"],
-            credentials["target"]["host"],
-            str(credentials["target"]["port"]),
-            "auto"
-        ]
-        subprocess.run(args, check=True)
+        if not _confirm_migration(auto_confirm):
+            return
+
+        os.makedirs("dump", exist_ok=True)
+        dump_file = os.path.join("dump", f"pg_schema_{datetime.now().strftime('%Y%m%d_%H%M%S')}.dump")
+
+        logger.info("Dumping source schema...")
+        dump_schema(credentials, dump_file)
+        logger.info("Restoring pre-data section (tables)...")
+        restore_section(credentials, dump_file, "pre-data")
+        if unlogged_during_load:
+            _set_tables_logged_state(target_engine, logged=False)
+        copy_all_tables(credentials, source_engine, max_workers=parallel, batch_size=batch_size)
+        if unlogged_during_load:
+            _set_tables_logged_state(target_engine, logged=True)
+        logger.info("Syncing sequence values...")
+        sync_sequences(source_engine, target_engine)
+        logger.info("Restoring post-data section (indexes, constraints, triggers)...")
+        restore_section(credentials, dump_file, "post-data", jobs=cpu_count())
+        logger.info("Refreshing materialized views...")
+        refresh_materialized_views(target_engine)
         logger.info("Migration completed successfully.")
     except Exception as e:
         logger.error("Error in start_migration: %s", e)
@@ -95,28 +458,10 @@ def manual_migration(database_name: str, auto_confirm: bool = False):
         logger.info("Starting manual migration process...")
         credentials, source_engine, target_engine = setup_connection()
 
-        if not auto_confirm:
-            confirm = input("Do you want to start the migration? (y/n): ").strip().lower()
-            if confirm != "y":
-                logger.info("Migration aborted by user.")
-                return
-
-        args = [
-            "bash", "migrate_postgres.sh",
-            credentials["source"]["database"],
-            credentials["source"]["user"],
-            credentials["source"]["password"],
-            credentials["source"]["host"],
-            str(credentials["source"]["port"]),
-            credentials["target"]["database"],
-            credentials["target"]["user"],
-            credentials["target"]["password"],
-            credentials["target"]["host"],
-            str(credentials["target"]["port"]),
-            "manual",
-            "./dump/pg_dump_20250513_114630.dump"
-        ]
-        subprocess.run(args, check=True)
+        if not _confirm_migration(auto_confirm):
+            return
+
+        _run_shell_migration(credentials, "manual", "./dump/pg_dump_20250513_114630.dump")
         logger.info("Manual migration completed successfully.")
     except Exception as e:
         logger.error("Error in manual_migration: %s", e)
@@ -141,12 +486,12 @@ def info(database_name: str, client: str):
         logger.error("Error in info: %s", e)
         raise
 
-def reports():
+def reports(exact: bool = False, schemas=None):
     """Generates comparison reports."""
     try:
         logger.info("Generating migration reports...")
         _, source_engine, target_engine = setup_connection()
-        compare_row_counts(source_engine, target_engine)
+        compare_row_counts(source_engine, target_engine, exact=exact, schemas=schemas)
     except Exception as e:
         logger.error("Error in reports: %s", e)
         raise
@@ -176,11 +521,20 @@ if __name__ == "__main__":
         if args["--info"]:
             info(database_name=args["--database"], client=args["--info"])
         elif args["--start"]:
-            start_migration(database_name=args["--database"], auto_confirm=args["-y"])
+            start_migration(
+                database_name=args["--database"],
+                auto_confirm=args["-y"],
+                parallel=int(args["--parallel"]) if args["--parallel"] else None,
+                batch_size=int(args["--batch-size"]) if args["--batch-size"] else DEFAULT_BATCH_SIZE,
+                unlogged_during_load=args["--unlogged-during-load"]
+            )
         elif args["--startmanual"]:
             manual_migration(database_name=args["--database"], auto_confirm=args["-y"])
         elif args["--reports"]:
-            reports()
+            reports(
+                exact=args["--exact"],
+                schemas=args["--schemas"].split(",") if args["--schemas"] else None
+            )
         elif args["--setup"]:
             write_config_file()
     except Exception as e:
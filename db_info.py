@@ -1,11 +1,15 @@
+import asyncio
+import io
 import os
 import json
 import logging
+import zipfile
+import asyncpg
 import pandas as pd
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, Session as SQLAlchemySession
-from contextlib import contextmanager
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from lxml import etree
+from pathlib import Path
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from tabulate import tabulate
 
 # ---------------------- Logging Setup ----------------------
@@ -30,65 +34,256 @@ logger = logging_setup("migration","migration.log")
 
 # -----------------------------------------------------------
 
-@contextmanager
-def get_db_connection(database_url: str):
-    """Context manager that yields a SQLAlchemy session."""
-    SessionLocal = sessionmaker(bind=database_url)
-    session = SessionLocal()
-    try:
-        yield session
-    finally:
-        session.close()
-
-def execute_query(conn: SQLAlchemySession, query: str):
-    """Executes a SQL query and returns the results."""
-    try:
-        result = conn.execute(text(query)).fetchall()
-        return result
-    except Exception as e:
-        logger.error(f"Error executing query: {query} | Error: {e}")
-        raise
-
-def find_objects(query: str, types_name: str, database_url: str):
-    """Finds specific database objects (e.g., tables, views)."""
-    with get_db_connection(database_url) as conn:
-        if conn is None:
-            logger.warning(f"Unable to connect to the database for {types_name}.")
-            return []
-        result = execute_query(conn, query)
-        return result if result else f"{types_name} not found."
-
-def save_results_to_file(filename: str, types_name: str, results):
-    """Saves the results of a query to both an Excel and a text file."""
-    try:
-        df = pd.DataFrame(results) if isinstance(results, list) else pd.DataFrame([results])
-        with pd.ExcelWriter(f"{filename}.xlsx", mode='a', engine='openpyxl', if_sheet_exists='replace') as writer:
-            df.to_excel(writer, sheet_name=types_name, index=False)
+# Invariant catalog SQL, composed once at import time.
+TABLES_QUERY = """
+    SELECT schemaname, relname
+    FROM pg_stat_user_tables
+    {where}
+"""
 
-        if df.columns.tolist() == [0] or not df.columns.tolist():
-            df.columns = [f"" for _ in range(df.shape[1])]
+TABLE_COUNTS_QUERY = """
+    SELECT schemaname, relname, n_live_tup
+    FROM pg_stat_user_tables
+    {where}
+"""
 
-        with open(f"{filename}.txt", "a") as file:
-            file.write(f"\n{types_name}:\n")
-            file.write(f"{'=' * 20}\n")
-            file.write(f"Total rows: {len(df)}\n")
-            file.write(tabulate(df, headers="keys", tablefmt="grid"))
-            file.write("\n\n")
+def _schema_filter_sql(schemas):
+    """WHERE clause restricting a pg_stat_user_tables query to schemas.
 
+    Filtering server-side keeps databases with thousands of partitions
+    from shipping a catalog's worth of irrelevant rows per run.
+    """
+    if not schemas:
+        return ""
+    quoted = ", ".join("'{}'".format(s.replace("'", "''")) for s in schemas)
+    return f"WHERE schemaname IN ({quoted})"
+
+def _cell(value):
+    """Coerces values xlsxwriter cannot serialize natively to str."""
+    return value if isinstance(value, (int, float, str, bool, type(None))) else str(value)
+
+def _row_headers(first):
+    """Column names for a driver row (asyncpg Record / SQLAlchemy Row), or None."""
+    if isinstance(first, dict):
+        return None
+    if hasattr(first, "_mapping"):
+        return list(first._mapping.keys())
+    if hasattr(first, "keys"):
+        return list(first.keys())
+    return None
+
+_row_formatters = {}
+
+def _row_formatter(ncols):
+    """Returns a compiled TSV formatter specialized for a column count.
+
+    The generic join runs a Python-level loop with a None branch per
+    cell; for a fixed width we instead compile one f-string lambda with
+    hardcoded indices, so each row serializes in a single format opcode
+    sequence. Compiled once per shape and cached for the process.
+    """
+    fmt = _row_formatters.get(ncols)
+    if fmt is None:
+        cells = "\\t".join(
+            f"{{'' if row[{i}] is None else row[{i}]}}" for i in range(ncols)
+        )
+        fmt = eval(f'lambda row: f"{cells}\\n"')
+        _row_formatters[ncols] = fmt
+    return fmt
+
+def _format_text_block(types_name: str, headers, rows):
+    """Builds one text-report section as a string.
+
+    Free of shared state so it can run in a worker process; tabulate on
+    many sheets is the CPU-bound part of report writing.
+    """
+    lines = [f"\n{types_name}:\n", f"{'=' * 20}\n", f"Total rows: {len(rows)}\n"]
+    if len(rows) > 1000:
+        lines.append("\t".join(headers) + "\n")
+        lines.extend(map(_row_formatter(len(headers)), rows))
+    else:
+        lines.append(tabulate(rows, headers=headers, tablefmt="grid"))
+    lines.append("\n\n")
+    return "".join(lines)
+
+def _write_rows_direct(excel_writer, text_fh, types_name: str, headers, rows, text_block=None):
+    """Writes header + tuple rows straight to the workbook and text report.
+
+    Skips the DataFrame round trip entirely: for the typical small
+    metadata result the frame construction costs more than the write.
+    A pre-formatted text_block (e.g. from a worker process) is written
+    as-is.
+    """
+    ws = excel_writer.book.add_worksheet(types_name)
+    ws.write_row(0, 0, headers)
+    for i, row in enumerate(rows, start=1):
+        ws.write_row(i, 0, [_cell(v) for v in row])
+    excel_writer.sheets[types_name] = ws
+
+    if text_block is None:
+        text_block = _format_text_block(types_name, headers, rows)
+    text_fh.write(text_block)
+
+def save_results_to_file(excel_writer, text_fh, types_name: str, results):
+    """Saves the results of a query to both an Excel and a text file.
+
+    excel_writer is a pd.ExcelWriter and text_fh a buffered text handle,
+    both held open by the caller for the whole run: the workbook is
+    serialized once and the text report streams through one writer
+    instead of an open/append/close cycle per section. Every input shape
+    goes through the row-major direct path: the workbook runs in
+    constant-memory mode, which flushes rows in order and silently drops
+    out-of-order cells, so pandas' column-by-column to_excel must never
+    write into it.
+    """
+    try:
+        if not isinstance(results, list):
+            results = [results]
+
+        headers = _row_headers(results[0]) if results else None
+        if headers is not None:
+            rows = [tuple(r) for r in results]
+        elif results and isinstance(results[0], dict):
+            headers = list(results[0].keys())
+            rows = [tuple(r.get(h) for h in headers) for r in results]
+        else:
+            # Scalar payloads (e.g. "<name> not found.") become a single
+            # anonymous column, matching the old placeholder sheets.
+            headers = [""]
+            rows = [(value,) for value in results]
+
+        _write_rows_direct(excel_writer, text_fh, types_name, headers, rows)
         logger.info(f"Saved results for '{types_name}' to file.")
     except Exception as e:
         logger.error(f"Error saving results for {types_name}: {e}")
         raise
 
+# Above this many rows in any sheet, emit worksheet XML directly instead
+# of going through the workbook library's per-cell object construction.
+STREAM_XLSX_THRESHOLD = 50_000
+
+_XLSX_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_XLSX_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+def _xlsx_row_element(values):
+    """One <row> element with numbers as <v> and strings inlined."""
+    row = etree.Element("row")
+    for value in values:
+        if value is None:
+            etree.SubElement(row, "c")
+        elif isinstance(value, bool):
+            cell = etree.SubElement(row, "c", t="b")
+            etree.SubElement(cell, "v").text = "1" if value else "0"
+        elif isinstance(value, (int, float)):
+            cell = etree.SubElement(row, "c")
+            etree.SubElement(cell, "v").text = str(value)
+        else:
+            cell = etree.SubElement(row, "c", t="inlineStr")
+            inline = etree.SubElement(cell, "is")
+            etree.SubElement(inline, "t").text = str(value)
+    return row
+
+def _write_sheet_xml(fh, headers, rows):
+    """Streams one worksheet's XML into an open file handle."""
+    with etree.xmlfile(fh, encoding="UTF-8") as xf:
+        xf.write_declaration()
+        with xf.element("worksheet", xmlns=_XLSX_MAIN_NS):
+            with xf.element("sheetData"):
+                xf.write(_xlsx_row_element(headers))
+                for row in rows:
+                    xf.write(_xlsx_row_element(row))
+
+def save_results_to_file_streaming(path, sheets):
+    """Writes an xlsx by emitting worksheet XML straight into the ZIP.
+
+    sheets is a list of (name, headers, rows) triples. Each row is
+    serialized incrementally with lxml's xmlfile writer, so memory stays
+    flat and no intermediate cell objects are built — the same mechanism
+    that makes write-only workbook modes fast, minus their overhead.
+    """
+    content_types = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>',
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">',
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>',
+        '<Default Extension="xml" ContentType="application/xml"/>',
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>',
+    ]
+    workbook = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>',
+        f'<workbook xmlns="{_XLSX_MAIN_NS}" xmlns:r="{_XLSX_REL_NS}"><sheets>',
+    ]
+    workbook_rels = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>',
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">',
+    ]
+    for i, (name, _, _) in enumerate(sheets, start=1):
+        content_types.append(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        )
+        workbook.append(f'<sheet name="{name}" sheetId="{i}" r:id="rId{i}"/>')
+        workbook_rels.append(
+            f'<Relationship Id="rId{i}" Type="{_XLSX_REL_NS}/worksheet" '
+            f'Target="worksheets/sheet{i}.xml"/>'
+        )
+    content_types.append('</Types>')
+    workbook.append('</sheets></workbook>')
+    workbook_rels.append('</Relationships>')
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", "".join(content_types))
+        zf.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{_XLSX_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ))
+        zf.writestr("xl/workbook.xml", "".join(workbook))
+        zf.writestr("xl/_rels/workbook.xml.rels", "".join(workbook_rels))
+        for i, (name, headers, rows) in enumerate(sheets, start=1):
+            with zf.open(f"xl/worksheets/sheet{i}.xml", "w") as fh:
+                _write_sheet_xml(fh, headers, rows)
+    logger.info(f"Streamed {len(sheets)} sheet(s) to {path} via direct XML emission.")
+
+def _engine_dsn(engine):
+    """Plain libpq DSN for asyncpg, derived from an engine's URL."""
+    return engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+async def _run_queries_async(dsn: str, queries: dict):
+    """Fans the metadata queries out concurrently over an asyncpg pool.
+
+    Returns (types_name, records) pairs; records is None when the query
+    failed. On a high-latency link the wall clock approaches the slowest
+    single query instead of the sum, with no thread or GIL overhead.
+    """
+    pool = await asyncpg.create_pool(dsn, min_size=4, max_size=16)
+    try:
+        async def one(types_name, query):
+            try:
+                async with pool.acquire() as conn:
+                    return types_name, await conn.fetch(query)
+            except Exception as e:
+                logger.error(f"Query '{types_name}' failed: {e}")
+                return types_name, None
+        return await asyncio.gather(*(one(n, q) for n, q in queries.items()))
+    finally:
+        await pool.close()
+
+def _reset_output(output_file: str):
+    """Truncates the .txt report and drops any stale .xlsx beside it."""
+    txt_path = f"{output_file}.txt"
+    if os.path.exists(txt_path):
+        # In-place truncate skips the open/close file-object churn of the
+        # write-then-close idiom on reruns.
+        os.truncate(txt_path, 0)
+    else:
+        Path(txt_path).touch()
+    Path(f"{output_file}.xlsx").unlink(missing_ok=True)
+
 def fetch_db_info(database_url: str, database_name: str, client: str):
     os.makedirs('./output_folder', exist_ok=True)
     output_file = f"output_folder/output_{client}_{database_name}"
-
-    open(f'{output_file}.txt', "w").close()
-    if os.path.exists(f"{output_file}.xlsx"):
-        os.remove(f"{output_file}.xlsx")
-
-    pd.DataFrame(["MoveSync"]).to_excel(f"{output_file}.xlsx", index=False, sheet_name="MoveSync")
+    _reset_output(output_file)
 
     current_dir = os.path.dirname(os.path.abspath(__file__)) if '__file__' in globals() else os.getcwd()
     json_path = os.path.join(current_dir, f'db_info_json/{database_name}_info.json')
@@ -101,34 +296,94 @@ def fetch_db_info(database_url: str, database_name: str, client: str):
         raise
 
     logger.info(f"Starting fetch_db_info for {client} - {database_name}")
-    with ThreadPoolExecutor() as executor:
-        futures = {
-            executor.submit(find_objects, query, types_name, database_url): types_name
-            for types_name, query in queries.items()
-        }
-
-        for future in as_completed(futures):
-            types_name = futures[future]
-            try:
-                result = future.result()
-                if result:
-                    save_results_to_file(output_file, types_name, result)
-                else:
-                    logger.warning(f"No result returned for '{types_name}'")
-            except Exception as e:
-                logger.error(f"Query '{types_name}' failed: {e}")
+    results = asyncio.run(_run_queries_async(_engine_dsn(database_url), queries))
+
+    # Text formatting is CPU-bound and per-sheet independent, so it runs
+    # in worker processes; the workbook and text file stay on this
+    # thread since neither writer is safe to share.
+    with pd.ExcelWriter(f"{output_file}.xlsx", engine='xlsxwriter',
+                        engine_kwargs={'options': {'constant_memory': True, 'strings_to_urls': False}}) as excel_writer, \
+            open(f"{output_file}.txt", "w", buffering=1 << 20) as text_fh, \
+            ProcessPoolExecutor(max_workers=os.cpu_count()) as format_pool:
+        pending = []
+        for types_name, records in results:
+            if records is None:
+                continue
+            if records:
+                headers = list(records[0].keys())
+                rows = [tuple(r) for r in records]
+                pending.append((types_name, headers, rows,
+                                format_pool.submit(_format_text_block, types_name, headers, rows)))
+            else:
+                pending.append((types_name, None, f"{types_name} not found.", None))
+
+        for types_name, headers, rows, future in pending:
+            if future is None:
+                save_results_to_file(excel_writer, text_fh, types_name, rows)
+            else:
+                _write_rows_direct(excel_writer, text_fh, types_name, headers, rows,
+                                   text_block=future.result())
 
     logger.info(f"[DONE] Output saved at {os.path.abspath(output_file)}")
 
-def get_tables(engine):
-    with engine.connect() as conn:
-        return conn.execute(text("""
-            SELECT schemaname, relname
-            FROM pg_stat_user_tables
-            ORDER BY schemaname, relname;
-        """)).fetchall()
+def read_sql_copy(engine, select_sql: str) -> pd.DataFrame:
+    """Extracts a SELECT result via COPY ... TO STDOUT into a DataFrame.
+
+    COPY streams CSV straight off the wire, skipping the driver's
+    per-row tuple construction and SQLAlchemy's row wrapping. Columns
+    are read back as verbatim strings: default NA handling would turn a
+    schema or table literally named "NA" into NaN, and dtype inference
+    would turn numeric-looking names into ints, before the values get
+    spliced back into SQL.
+    """
+    raw = engine.raw_connection()
+    try:
+        buf = io.BytesIO()
+        with raw.cursor() as cur:
+            with cur.copy(f"COPY ({select_sql}) TO STDOUT WITH (FORMAT CSV, HEADER)") as cp:
+                for block in cp:
+                    buf.write(block)
+        buf.seek(0)
+        return pd.read_csv(buf, dtype=str, keep_default_na=False)
+    finally:
+        raw.close()
+
+_tables_cache = {}
+
+def get_tables(engine, schemas=None):
+    """Lists (schema, table) pairs, optionally limited to given schemas.
+
+    The filter is pushed into the catalog query and the result memoized
+    per (engine URL, schema set) for the life of the process, so repeated
+    comparisons against the same database reuse one fetch.
+    """
+    schemas = tuple(schemas) if schemas else None
+    key = (str(engine.url), schemas)
+    if key not in _tables_cache:
+        df = read_sql_copy(engine, TABLES_QUERY.format(where=_schema_filter_sql(schemas)))
+        _tables_cache[key] = list(df.itertuples(index=False, name=None))
+    return _tables_cache[key]
+
+def get_table_counts(engine, schemas=None):
+    """Fetches estimated row counts for every user table in one round trip.
+
+    n_live_tup is the planner's running estimate; reading it replaces a
+    sequential scan per table with a single catalog read.
+    """
+    df = read_sql_copy(engine, TABLE_COUNTS_QUERY.format(where=_schema_filter_sql(schemas)))
+    return {(s, t): int(n) for s, t, n in df.itertuples(index=False, name=None)}
+
+@lru_cache(maxsize=4096)
+def _count_sql(schema, table):
+    """Composed per-table COUNT statement, cached per identifier pair.
+
+    Identifiers cannot be bind parameters in a prepared plan, so the
+    statement text itself is what gets reused; asyncpg's statement cache
+    then maps the identical text back to one server-side prepared plan.
+    """
+    return f'SELECT COUNT(*) FROM "{schema}"."{table}"'
 
-def count_rows(schema, table, engine, side):
+async def _count_rows_async(pool, schema, table, side):
     result = {
         "schema_name": schema,
         "table_name": table,
@@ -136,92 +391,198 @@ def count_rows(schema, table, engine, side):
         f"{side}_error": None
     }
     try:
-        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
-            query = text(f'SELECT COUNT(*) FROM "{schema}"."{table}"')
-            result[f"estimated_rows_{side}"] = conn.execute(query).scalar()
+        async with pool.acquire() as conn:
+            result[f"estimated_rows_{side}"] = await conn.fetchval(_count_sql(schema, table))
     except Exception as e:
         result[f"{side}_error"] = str(e)
         logger.error(f"{side.upper()} count error for {schema}.{table}: {e}")
     return result
 
-def compare_row_counts(source_engine: str, target_engine: str, max_workers=10):
+# Tables per batched COUNT statement; amortizes one round trip over the
+# whole chunk while keeping statements a manageable size.
+COUNT_CHUNK_SIZE = 200
+
+# Template for a merged report row, copied per table instead of
+# re-building the literal inside the merge loop.
+_ROW_DEFAULTS = {
+    "estimated_rows_source": None,
+    "estimated_rows_target": None,
+    "source_error": None,
+    "target_error": None
+}
+
+def _default_row(schema, table):
+    row = {"schema_name": schema, "table_name": table}
+    row.update(_ROW_DEFAULTS)
+    return row
+
+@lru_cache(maxsize=1024)
+def _count_union_sql(chunk):
+    parts = []
+    for schema, table in chunk:
+        s = schema.replace("'", "''")
+        t = table.replace("'", "''")
+        parts.append(
+            f"SELECT '{s}' AS schema_name, '{t}' AS table_name, "
+            f'(SELECT COUNT(*) FROM "{schema}"."{table}") AS n'
+        )
+    return " UNION ALL ".join(parts)
+
+async def _count_chunk_async(pool, chunk, side):
+    """Counts a chunk of tables in one UNION ALL round trip.
+
+    Falls back to per-table counts if the batched statement fails (e.g.
+    one table in the chunk was dropped mid-run), so a single bad table
+    cannot poison the whole chunk.
+    """
+    try:
+        async with pool.acquire() as conn:
+            records = await conn.fetch(_count_union_sql(chunk))
+        return [
+            {
+                "schema_name": r["schema_name"],
+                "table_name": r["table_name"],
+                f"estimated_rows_{side}": r["n"],
+                f"{side}_error": None
+            }
+            for r in records
+        ]
+    except Exception as e:
+        logger.warning(f"{side.upper()} batched count failed ({e}); retrying per table")
+        return list(await asyncio.gather(*(
+            _count_rows_async(pool, schema, table, side) for schema, table in chunk
+        )))
+
+def _count_chunks(tables):
+    """Splits a sorted table list into memoizable UNION ALL chunks."""
+    # Tuples so the composed chunk SQL is memoizable across runs
+    return [
+        tuple(tables[i:i + COUNT_CHUNK_SIZE])
+        for i in range(0, len(tables), COUNT_CHUNK_SIZE)
+    ]
+
+async def _gather_counts(src_dsn, tgt_dsn, source_tables, target_tables, max_workers):
+    """Runs the COUNT queries concurrently on two asyncpg pools.
+
+    Tables are grouped into UNION ALL chunks so the network cost is one
+    round trip per chunk rather than per table, and a blocked chunk only
+    parks a coroutine, not an OS thread. Each side is chunked from its
+    own table list: a table missing on one side would otherwise error
+    that side's whole batched statement, and missing tables are exactly
+    what the report exists to find.
+    """
+    src_pool = await asyncpg.create_pool(src_dsn, min_size=1, max_size=max_workers,
+                                         statement_cache_size=1024)
+    tgt_pool = await asyncpg.create_pool(tgt_dsn, min_size=1, max_size=max_workers,
+                                         statement_cache_size=1024)
+    try:
+        chunk_results = await asyncio.gather(
+            *(_count_chunk_async(src_pool, chunk, "source")
+              for chunk in _count_chunks(source_tables)),
+            *(_count_chunk_async(tgt_pool, chunk, "target")
+              for chunk in _count_chunks(target_tables)),
+        )
+        return [result for chunk in chunk_results for result in chunk]
+    finally:
+        await src_pool.close()
+        await tgt_pool.close()
+
+def compare_row_counts(source_engine: str, target_engine: str, max_workers=10, exact=False,
+                       schemas=None):
     """
     Compare row counts between source and target PostgreSQL databases and save results to Excel.
+
+    By default the counts come from pg_stat_user_tables.n_live_tup, one
+    catalog read per engine instead of a sequential scan per table.
+    Pass exact=True to run COUNT(*) against every table instead, and
+    schemas (a list of schema names) to limit the comparison.
     """
     os.makedirs('./output_folder', exist_ok=True)
     output_file = os.path.join("output_folder", "reports")
-
-    open(f"{output_file}.txt", "w").close()
-    if os.path.exists(f"{output_file}.xlsx"):
-        os.remove(f"{output_file}.xlsx")
-
-    pd.DataFrame(["MoveSync"]).to_excel(f"{output_file}.xlsx", index=False, sheet_name="MoveSync")
-
-    source_tables = set(get_tables(source_engine))
-    target_tables = set(get_tables(target_engine))
-    all_tables = sorted(source_tables.union(target_tables))
-    total_tables = len(all_tables)
-    logger.info(f"Total unique tables (source + target): {total_tables}")
+    _reset_output(output_file)
 
     rows = {}
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {}
-
-        for schema, table in all_tables:
-            futures[executor.submit(count_rows, schema, table, source_engine, "source")] = (schema, table, "source")
-            futures[executor.submit(count_rows, schema, table, target_engine, "target")] = (schema, table, "target")
-
-        for i, future in enumerate(as_completed(futures), start=1):
-            schema, table, side = futures[future]
-            logger.info(f"[{i}/{len(futures)}] Started: {schema}.{table} ({side})")
-            try:
-                result = future.result()
-                key = (schema, table)
-                if key not in rows:
-                    rows[key] = {
-                        "schema_name": schema,
-                        "table_name": table,
-                        "estimated_rows_source": None,
-                        "estimated_rows_target": None,
-                        "source_error": None,
-                        "target_error": None
-                    }
-                rows[key].update(result)
-                logger.info(f"[{i}/{len(futures)}] Completed: {schema}.{table} ({side})")
-            except Exception as e:
-                logger.error(f"Failed processing {schema}.{table} ({side}): {e}")
-
-    merged_df = pd.DataFrame(rows.values())
-    merged_df["row_count_match"] = (
-        merged_df["estimated_rows_source"] == merged_df["estimated_rows_target"]
-    )
-
-    source_df = merged_df[merged_df["estimated_rows_source"].notna()]
-    target_df = merged_df[merged_df["estimated_rows_target"].notna()]
-
-    source_set = {
-        (row["schema_name"], row["table_name"], row["estimated_rows_source"])
-        for _, row in source_df.iterrows()
-    }
-    target_set = {
-        (row["schema_name"], row["table_name"], row["estimated_rows_target"])
-        for _, row in target_df.iterrows()
-    }
-
-    missing_in_source = target_set - source_set
-    missing_in_target = source_set - target_set
-
-    df_missing_source = pd.DataFrame(
-        list(missing_in_source), columns=["schema_name", "table_name", "estimated_rows"]
-    ) if missing_in_source else pd.DataFrame(columns=["schema_name", "table_name", "estimated_rows"])
-
-    df_missing_target = pd.DataFrame(
-        list(missing_in_target), columns=["schema_name", "table_name", "estimated_rows"]
-    ) if missing_in_target else pd.DataFrame(columns=["schema_name", "table_name", "estimated_rows"])
+    if exact:
+        # Source and target catalog scans are independent, so overlap them.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            source_future = executor.submit(get_tables, source_engine, schemas)
+            target_future = executor.submit(get_tables, target_engine, schemas)
+            source_tables = set(source_future.result())
+            target_tables = set(target_future.result())
+        all_tables = sorted(source_tables.union(target_tables))
+        logger.info(f"Total unique tables (source + target): {len(all_tables)}")
+
+        results = asyncio.run(_gather_counts(
+            _engine_dsn(source_engine), _engine_dsn(target_engine),
+            sorted(source_tables), sorted(target_tables), max_workers
+        ))
+        # Each result carries one side; tables absent from a side keep
+        # that side's None default, marking them as missing there.
+        rows = {key: _default_row(*key) for key in all_tables}
+        for result in results:
+            rows[(result["schema_name"], result["table_name"])].update(result)
+    else:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            source_future = executor.submit(get_table_counts, source_engine, schemas)
+            target_future = executor.submit(get_table_counts, target_engine, schemas)
+            src_counts = source_future.result()
+            tgt_counts = target_future.result()
+        logger.info(f"Total unique tables (source + target): {len(set(src_counts) | set(tgt_counts))}")
+
+        for key in sorted(set(src_counts) | set(tgt_counts)):
+            rows[key] = {
+                "schema_name": key[0],
+                "table_name": key[1],
+                "estimated_rows_source": src_counts.get(key),
+                "estimated_rows_target": tgt_counts.get(key),
+                "source_error": None,
+                "target_error": None
+            }
+
+    # The comparison and the set differences fall straight out of the
+    # rows dict; a DataFrame round trip here only adds block-manager
+    # allocations on top of data we already hold.
+    merged_headers = ["schema_name", "table_name", "estimated_rows_source",
+                      "estimated_rows_target", "source_error", "target_error",
+                      "row_count_match"]
+    merged = [
+        (r["schema_name"], r["table_name"],
+         r["estimated_rows_source"], r["estimated_rows_target"],
+         r["source_error"], r["target_error"],
+         r["estimated_rows_source"] == r["estimated_rows_target"])
+        for r in rows.values()
+    ]
+
+    # Rows with a None count on one side are exactly the tables missing there,
+    # so no extra set-difference pass is needed.
+    missing_headers = ["schema_name", "table_name", "estimated_rows"]
+    missing_source = [
+        (schema, table, r["estimated_rows_target"])
+        for (schema, table), r in rows.items()
+        if r["estimated_rows_source"] is None
+    ]
+    missing_target = [
+        (schema, table, r["estimated_rows_source"])
+        for (schema, table), r in rows.items()
+        if r["estimated_rows_target"] is None
+    ]
 
     # Save results
-    save_results_to_file(filename=output_file, types_name="RowCountComparison", results=merged_df.to_dict(orient='records'))
-    save_results_to_file(filename=output_file, types_name="MissingInSource", results=df_missing_source.to_dict(orient='records'))
-    save_results_to_file(filename=output_file, types_name="MissingInTarget", results=df_missing_target.to_dict(orient='records'))
+    sheets = [
+        ("RowCountComparison", merged_headers, merged),
+        ("MissingInSource", missing_headers, missing_source),
+        ("MissingInTarget", missing_headers, missing_target),
+    ]
+    if any(len(rows_) > STREAM_XLSX_THRESHOLD for _, _, rows_ in sheets):
+        save_results_to_file_streaming(f"{output_file}.xlsx", sheets)
+        with open(f"{output_file}.txt", "w", buffering=1 << 20) as text_fh:
+            for name, headers, rows_ in sheets:
+                text_fh.write(_format_text_block(name, headers, rows_))
+    else:
+        with pd.ExcelWriter(f"{output_file}.xlsx", engine='xlsxwriter',
+                            engine_kwargs={'options': {'constant_memory': True, 'strings_to_urls': False}}) as excel_writer, \
+                open(f"{output_file}.txt", "w", buffering=1 << 20) as text_fh:
+            for name, headers, rows_ in sheets:
+                _write_rows_direct(excel_writer, text_fh, name, headers, rows_)
 
     logger.info(f"[DONE] Excel and Text File saved at {os.path.abspath(output_file)}")